@@ -1,3 +1,5 @@
 from .error import *
 from .range import *
+from .cache import *
+from .ratelimit import *
 from .core import *
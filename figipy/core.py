@@ -1,18 +1,32 @@
+import asyncio
 import dataclasses
+import functools
 import json
 import os
+import sys
+import threading
+import time
+import types
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from logging import getLogger
-from typing import List, Iterable
+from typing import List, Iterable, Optional, Tuple
 
-import requests
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+import certifi
+import urllib3
+from urllib3.util.retry import Retry
 
 from figipy import (
     RateLimitError,
     PayloadTooLargeError,
     AuthenticationError,
+    HTTPStatusError,
+    APIConnectionError,
+    MappingError,
+    TTLCache,
+    TokenBucket,
     NumberRange,
     DateRange,
     assert_data_range_is_valid,
@@ -20,9 +34,58 @@ from figipy import (
     convert_number_range_to_string,
 )
 
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up
+    orjson = None
+
 logger = getLogger(__name__)
 
 OPEN_FIGI_DEFAULT_URL = "https://api.openfigi.com"
+OPEN_FIGI_MAX_JOBS = 10
+OPEN_FIGI_MAX_JOBS_WITH_API_KEY = 100
+# Requests allowed per interval (in seconds), per endpoint family
+OPEN_FIGI_MAPPING_RATE_LIMIT = (25, 60)
+OPEN_FIGI_MAPPING_RATE_LIMIT_WITH_API_KEY = (25, 6)
+OPEN_FIGI_SEARCH_RATE_LIMIT = (5, 60)
+OPEN_FIGI_SEARCH_RATE_LIMIT_WITH_API_KEY = (20, 60)
+# Longest Retry-After delay (in seconds) honoured before retrying a 429
+OPEN_FIGI_MAX_RETRY_AFTER = 60
+
+_STATUS_HANDLERS = {
+    429: (
+        logger.warning,
+        RateLimitError,
+        "Your application is being rate-limited, try to perform fewer requests",
+    ),
+    413: (
+        logger.warning,
+        PayloadTooLargeError,
+        "Your application requested too large of a payload, you may want to supply an API key",
+    ),
+    403: (
+        logger.error,
+        AuthenticationError,
+        "Your API key starting with {api_key} is not valid",
+    ),
+}
+
+# Slotted dataclasses need Python 3.10
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+if orjson is not None:
+
+    def _dump_json(data) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+
+    _load_json = orjson.loads
+else:
+
+    def _dump_json(data) -> bytes:
+        return json.dumps(data, sort_keys=True).encode()
+
+    _load_json = json.loads
 
 
 class MappingValues(Enum):
@@ -36,35 +99,79 @@ class MappingValues(Enum):
     STATE_CODE = "stateCode"
 
 
-@dataclasses.dataclass()
-class OpenApiFIGIResponse:
-    error: str
+class OpenFIGIObject:
+    __slots__ = (
+        "figi",
+        "security_type",
+        "security_type_2",
+        "market_sector",
+        "exchange_code",
+        "ticker",
+        "name",
+        "id",
+        "share_class_figi",
+        "composite_figi",
+        "security_description",
+        "future_or_option_id",
+        "metadata",
+    )
 
+    def __init__(
+        self,
+        figi: str,
+        security_type: str = None,
+        security_type_2: str = None,
+        market_sector: str = None,
+        exchange_code: str = None,
+        ticker: str = None,
+        name: str = None,
+        id: str = None,
+        share_class_figi: str = None,
+        composite_figi: str = None,
+        security_description: str = None,
+        future_or_option_id: str = None,
+        metadata: dict = None,
+    ):
+        self.figi = figi
+        self.security_type = security_type
+        self.security_type_2 = security_type_2
+        self.market_sector = market_sector
+        self.exchange_code = exchange_code
+        self.ticker = ticker
+        self.name = name
+        self.id = id
+        self.share_class_figi = share_class_figi
+        self.composite_figi = composite_figi
+        self.security_description = security_description
+        self.future_or_option_id = future_or_option_id
+        self.metadata = metadata
 
-@dataclasses.dataclass()
-class OpenFIGIObject:
-    figi: str
-    security_type: str = None
-    security_type_2: str = None
-    market_sector: str = None
-    exchange_code: str = None
-    ticker: str = None
-    name: str = None
-    id: str = None
-    share_class_figi: str = None
-    composite_figi: str = None
-    security_description: str = None
-    future_or_option_id: str = None
-    metadata: dict = None
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={value!r}" for name, value in zip(self.__slots__, self._values())
+        )
+        return f"{self.__class__.__name__}({fields})"
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()
+
+    # Instances are mutable, so they compare by value but are not hashable
+    __hash__ = None
 
     @classmethod
     def from_figi_data(cls, data: dict) -> "OpenFIGIObject":
-        return OpenFIGIObject(
-            figi=data.get("figipy"),
+        return cls(
+            figi=data.get("figi"),
             security_type=data.get("securityType"),
             security_type_2=data.get("securityType2"),
             market_sector=data.get("marketSecDes"),
             exchange_code=data.get("exchCode"),
+            ticker=data.get("ticker"),
             name=data.get("name"),
             id=data.get("id"),
             share_class_figi=data.get("shareClassFIGI"),
@@ -74,7 +181,7 @@ class OpenFIGIObject:
         )
 
 
-@dataclasses.dataclass()
+@dataclasses.dataclass(**_DATACLASS_SLOTS)
 class OpenFIGIProperties:
     exchange_code: str = None
     mic_code: str = None
@@ -103,136 +210,234 @@ class OpenFIGIProperties:
             assert_data_range_is_valid(self.maturity)
 
     def as_filter(self) -> dict:
-        return {
-            key: value
-            for (key, value) in {
-                "exchCode": self.exchange_code,
-                "micCode": self.mic_code,
-                "currency": self.currency,
-                "marketSecDes": self.market_sector_description,
-                "securityType": self.security_type,
-                "securityType2": self.security_type_2,
-                "includeUnlistedEquities": self.include_unlisted_equities,
-                "optionType": self.option_type,
-                "strike": convert_number_range_to_string(self.strike),
-                "contractSize": convert_number_range_to_string(self.contract_size),
-                "coupon": convert_number_range_to_string(self.coupon),
-                "expiration": convert_date_range_to_string(self.expiration),
-                "maturity": convert_date_range_to_string(self.maturity),
-                "stateCode": self.state_code,
-            }.items()
-            if value is not None
-        }
+        filters = {}
+        for attribute, key, converter in _PROPERTY_FILTER_FIELDS:
+            value = getattr(self, attribute)
+            if value is None:
+                continue
+            filters[key] = converter(value) if converter else value
+        return filters
 
 
-class OpenFIGIApi:
-    API_KEY = os.environ.get("OPEN_FIGI_API_KEY")
-    API_URL = os.environ.get("OPEN_FIGI_API_URL", OPEN_FIGI_DEFAULT_URL)
-    API_RAISE_ON_ERROR = json.loads(os.environ.get("OPEN_FIGI_RAISE_ON_ERROR", "false"))
-    API_RETRY_COUNT = int(os.environ.get("OPEN_FIGI_API_RETRY_COUNT", 2))
+_PROPERTY_FILTER_FIELDS = (
+    ("exchange_code", "exchCode", None),
+    ("mic_code", "micCode", None),
+    ("currency", "currency", None),
+    ("market_sector_description", "marketSecDes", None),
+    ("security_type", "securityType", None),
+    ("security_type_2", "securityType2", None),
+    ("include_unlisted_equities", "includeUnlistedEquities", None),
+    ("option_type", "optionType", None),
+    ("strike", "strike", convert_number_range_to_string),
+    ("contract_size", "contractSize", convert_number_range_to_string),
+    ("coupon", "coupon", convert_number_range_to_string),
+    ("expiration", "expiration", convert_date_range_to_string),
+    ("maturity", "maturity", convert_date_range_to_string),
+    ("state_code", "stateCode", None),
+)
+
+
+def _ca_bundle() -> str:
+    # Same precedence as requests, falling back to certifi's bundle
+    for variable in ("REQUESTS_CA_BUNDLE", "CURL_CA_BUNDLE", "SSL_CERT_FILE"):
+        if os.environ.get(variable):
+            return os.environ[variable]
+    return certifi.where()
+
 
+def _proxy_for(url: str) -> Optional[str]:
+    parsed = urllib3.util.parse_url(url)
+    if urllib.request.proxy_bypass(parsed.host):
+        return None
+    proxies = urllib.request.getproxies()
+    return proxies.get(parsed.scheme) or proxies.get("all")
+
+
+class OpenFIGIApi:
     def __init__(
-        self, raise_on_error=None, api_key=None, api_url=None, api_retry_count=None
+        self,
+        raise_on_error=None,
+        api_key=None,
+        api_url=None,
+        api_retry_count=None,
+        cache_ttl=None,
+        pool_size=10,
     ):
-        self.raise_on_error = raise_on_error or self.API_RAISE_ON_ERROR
-        self.api_retry_count = api_retry_count or self.API_RETRY_COUNT
-        self.api_key = api_key or self.API_KEY
-        self.api_url = api_url or self.API_URL
-
-    def create_session(self) -> requests.Session:
-        session = requests.Session()
-        session.mount(
-            "https://",
-            HTTPAdapter(
-                max_retries=Retry(
-                    total=self.api_retry_count,
-                    backoff_factor=5,
-                    status_forcelist=[429],
-                    method_whitelist=False,
-                )
+        if raise_on_error is None:
+            raise_on_error = json.loads(
+                os.environ.get("OPEN_FIGI_RAISE_ON_ERROR", "false")
+            )
+        if api_retry_count is None:
+            api_retry_count = int(os.environ.get("OPEN_FIGI_API_RETRY_COUNT", 2))
+        if api_key is None:
+            api_key = os.environ.get("OPEN_FIGI_API_KEY")
+        if api_url is None:
+            api_url = os.environ.get("OPEN_FIGI_API_URL", OPEN_FIGI_DEFAULT_URL)
+        if cache_ttl is None:
+            cache_ttl = float(os.environ.get("OPEN_FIGI_API_CACHE_TTL", 3600))
+        self.raise_on_error = raise_on_error
+        self.api_retry_count = api_retry_count
+        self.api_key = api_key
+        self.api_url = api_url
+        # Includes br when brotli is installed
+        headers = urllib3.util.make_headers(accept_encoding=True)
+        headers["Content-Type"] = "application/json"
+        if self.api_key:
+            headers["X-OPENFIGI-APIKEY"] = self.api_key
+        self._headers = types.MappingProxyType(headers)
+        self.pool_size = pool_size
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        if self.api_key:
+            self._mapping_bucket = TokenBucket(
+                *OPEN_FIGI_MAPPING_RATE_LIMIT_WITH_API_KEY
+            )
+            self._search_bucket = TokenBucket(*OPEN_FIGI_SEARCH_RATE_LIMIT_WITH_API_KEY)
+        else:
+            self._mapping_bucket = TokenBucket(*OPEN_FIGI_MAPPING_RATE_LIMIT)
+            self._search_bucket = TokenBucket(*OPEN_FIGI_SEARCH_RATE_LIMIT)
+        self.cache_ttl = cache_ttl
+        self._cache = TTLCache(maxsize=1024, ttl=self.cache_ttl)
+
+    @property
+    def pool(self) -> urllib3.PoolManager:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = self.create_pool()
+        return self._pool
+
+    def create_pool(self) -> urllib3.PoolManager:
+        options = dict(
+            num_pools=4,
+            maxsize=self.pool_size,
+            retries=Retry(
+                total=self.api_retry_count,
+                backoff_factor=0.5,
+                allowed_methods=False,
             ),
+            ca_certs=_ca_bundle(),
         )
-        return session
+        proxy = _proxy_for(self.api_url)
+        if proxy:
+            return urllib3.ProxyManager(proxy, **options)
+        return urllib3.PoolManager(**options)
+
+    def invalidate_cache(self):
+        self._cache.clear()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.clear()
+            self._pool = None
 
     def _perform_pagination_request(
-        self, url: str, method: str, data=None
+        self, url: str, method: str, bucket: TokenBucket, data=None
     ) -> Iterable[dict]:
-        session = self.create_session()
-        response = self._perform_request(
-            url,
-            method,
-            data=data,
-            session=session
-        )
+        response = self._perform_request(url, method, bucket, data=data)
         while "data" in response and len(response["data"]):
             for part in response["data"]:
                 yield part
             if "next" in response:
                 response = self._perform_request(
-                    url,
-                    method,
-                    data=dict(data, start=response["next"]),
-                    session=session
+                    url, method, bucket, data=dict(data, start=response["next"])
                 )
             else:
                 break
 
-    def _perform_request(self, url: str, method: str, data=None, session=None) -> dict:
-        if session is None:
-            session = self.create_session()
-        headers = {
-            "Content-Type": "application/json"
-        }
-        if self.api_key:
-            headers["X-OPENFIGI-APIKEY"] = self.api_key
-        response = session.request(
-            method,
-            url,
-            data=json.dumps(data),
-            headers=headers
-        )
-        if response.status_code == 429:
-            logger.warning(
-                "Your application is being rate-limited, try to perform fewer requests"
-            )
-            if self.raise_on_error:
-                raise RateLimitError()
-        if response.status_code == 413:
-            logger.warning(
-                "Your application requested too large of a payload, you may want to supply an API key"
+    @staticmethod
+    def _retry_after(response: urllib3.HTTPResponse, bucket: TokenBucket) -> float:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(int(retry_after), OPEN_FIGI_MAX_RETRY_AFTER)
+        return bucket.refill_interval
+
+    def _perform_request(
+        self, url: str, method: str, bucket: TokenBucket, data=None
+    ) -> dict:
+        body = None if data is None else _dump_json(data)
+        key = (method, url, body)
+        # The raw body is cached so every caller gets its own decoded copy
+        cached = self._cache.get(key)
+        if cached is not None:
+            return _load_json(cached)
+        for attempt in range(self.api_retry_count + 1):
+            bucket.acquire()
+            try:
+                response = self.pool.request(
+                    method, url, body=body, headers=self._headers
+                )
+            except urllib3.exceptions.HTTPError as e:
+                raise APIConnectionError(f"{method} {url} failed: {e}") from e
+            if response.status != 429 or attempt == self.api_retry_count:
+                break
+            time.sleep(self._retry_after(response, bucket))
+        handler = _STATUS_HANDLERS.get(response.status)
+        if handler is not None:
+            log, error_class, message = handler
+            log(
+                message.format(
+                    api_key=self.api_key[:4] if self.api_key else "(NOT SUPPLIED)"
+                )
             )
             if self.raise_on_error:
-                raise PayloadTooLargeError()
-        if response.status_code == 403:
-            logger.error(
-                f"Your API key starting with {self.api_key[:4] if self.api_key else '(NOT SUPPLIED)'} is not valid"
-            )
+                raise error_class()
+        if response.status >= 400:
             if self.raise_on_error:
-                raise AuthenticationError()
-        if self.raise_on_error:
-            response.raise_for_status()
-        if response.ok:
-            return response.json()
-        return {}
+                raise HTTPStatusError(f"{response.status} response to {method} {url}")
+            return {}
+        result = _load_json(response.data)
+        if not (isinstance(result, dict) and "error" in result):
+            self._cache[key] = response.data
+        return result
 
-    def search(
+    def search_raw(
         self, query, properties: OpenFIGIProperties = None
-    ) -> Iterable[OpenApiFIGIResponse]:
+    ) -> Iterable[dict]:
         """
 
         :param query: Key words to query
         :param properties: Properties to filter on
-        :return:
+        :return: The records as returned by the API, fetched page by page
         """
         if properties is None:
             properties = OpenFIGIProperties()
-        for figi_object_data in self._perform_pagination_request(
+        return self._perform_pagination_request(
             f"{self.api_url}/v2/search/",
             "POST",
+            self._search_bucket,
             dict(properties.as_filter(), query=query),
-        ):
+        )
+
+    def search(
+        self, query, properties: OpenFIGIProperties = None
+    ) -> Iterable[OpenFIGIObject]:
+        """
+
+        :param query: Key words to query
+        :param properties: Properties to filter on
+        :return:
+        """
+        for figi_object_data in self.search_raw(query, properties=properties):
             yield OpenFIGIObject.from_figi_data(figi_object_data)
 
+    def search_many(
+        self,
+        queries: Iterable[Tuple[str, Optional[OpenFIGIProperties]]],
+        max_workers=8,
+    ) -> List[List[OpenFIGIObject]]:
+        """
+        Run independent searches concurrently over the shared connection pool.
+
+        :param queries: Pairs of key words and the properties to filter on
+        :param max_workers: Number of searches in flight at once, at most pool_size
+        :return: All objects found for each query, in the order the queries were given
+        """
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, self.pool_size)
+        ) as executor:
+            return list(executor.map(lambda query: list(self.search(*query)), queries))
+
     def mapping_values(self, values: MappingValues) -> List[str]:
         """
 
@@ -242,5 +447,163 @@ class OpenFIGIApi:
         if values is None:
             raise ValueError("Supplied value may not be None")
         return self._perform_request(
-            f"{self.api_url}/v2/mapping/values/{values.value}", "GET"
+            f"{self.api_url}/v2/mapping/values/{values.value}",
+            "GET",
+            self._mapping_bucket,
         )["values"]
+
+    def batch_map(self, jobs: List[dict]) -> List[List[OpenFIGIObject]]:
+        """
+
+        :param jobs: Mapping jobs, e.g. {"idType": "TICKER", "idValue": "IBM"}
+        :return: The objects found for each job, in the order the jobs were given.
+        :raises MappingError: When a batch of jobs could not be mapped
+        """
+        max_jobs = (
+            OPEN_FIGI_MAX_JOBS_WITH_API_KEY if self.api_key else OPEN_FIGI_MAX_JOBS
+        )
+        results = []
+        for start in range(0, len(jobs), max_jobs):
+            chunk = jobs[start : start + max_jobs]
+            response = self._perform_request(
+                f"{self.api_url}/v2/mapping/",
+                "POST",
+                self._mapping_bucket,
+                data=chunk,
+            )
+            if not isinstance(response, list) or len(response) != len(chunk):
+                raise MappingError(f"Mapping request failed: {response!r}")
+            for job_result in response:
+                results.append(
+                    [
+                        OpenFIGIObject.from_figi_data(figi_object_data)
+                        for figi_object_data in job_result.get("data", [])
+                    ]
+                )
+        return results
+
+
+class AsyncOpenFIGIApi:
+    """
+    Asyncio front-end for :class:`OpenFIGIApi`.
+
+    Requests run on an executor and share the connection pool of the wrapped
+    client, so several searches can be awaited concurrently. Without an
+    explicit executor one is created with a thread per pooled connection.
+    """
+
+    def __init__(self, api: OpenFIGIApi = None, executor=None, **kwargs):
+        self.api = api or OpenFIGIApi(**kwargs)
+        self._owns_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=self.api.pool_size)
+        self.executor = executor
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def search(
+        self, query, properties: OpenFIGIProperties = None
+    ) -> List[OpenFIGIObject]:
+        """
+
+        :param query: Key words to query
+        :param properties: Properties to filter on
+        :return: All objects matching the query, across every page
+        """
+        return await self._run(
+            lambda: list(self.api.search(query, properties=properties))
+        )
+
+    async def mapping_values(self, values: MappingValues) -> List[str]:
+        """
+
+        :param values: The name of the Mapping Job property for which to list the possible values.
+        :return: The current list of values present for the property named by the key request parameter.
+        """
+        return await self._run(self.api.mapping_values, values)
+
+    async def batch_map(self, jobs: List[dict]) -> List[List[OpenFIGIObject]]:
+        """
+
+        :param jobs: Mapping jobs, e.g. {"idType": "TICKER", "idValue": "IBM"}
+        :return: The objects found for each job, in the order the jobs were given.
+        """
+        return await self._run(self.api.batch_map, jobs)
+
+    def invalidate_cache(self):
+        self.api.invalidate_cache()
+
+    def close(self):
+        if self._owns_executor:
+            self.executor.shutdown()
+        self.api.close()
+
+    async def __aenter__(self) -> "AsyncOpenFIGIApi":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class MapLoader:
+    """
+    Coalesces mapping jobs requested within one event-loop tick into a single
+    batched request, deduplicating identical jobs.
+
+    Results are kept in an LRU cache of ``cache_size`` entries, so repeated
+    lookups are answered without hitting the network.
+    """
+
+    def __init__(self, api: AsyncOpenFIGIApi = None, cache_size=1024):
+        self.api = api or AsyncOpenFIGIApi()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._queue = []
+        self._tasks = set()
+
+    def load(self, job: dict) -> "asyncio.Future[List[OpenFIGIObject]]":
+        key = _dump_json(job)
+        future = self._cache.get(key)
+        if future is not None and not future.cancelled():
+            self._cache.move_to_end(key)
+            # Shielded, so one caller giving up does not cancel the shared entry
+            return asyncio.shield(future)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        self._queue.append((key, job, future))
+        if len(self._queue) == 1:
+            loop.call_soon(self._dispatch)
+        return asyncio.shield(future)
+
+    def clear(self):
+        self._cache.clear()
+
+    def _forget(self, key: str, future: asyncio.Future):
+        if self._cache.get(key) is future:
+            del self._cache[key]
+
+    def _dispatch(self):
+        queue, self._queue = self._queue, []
+        task = asyncio.ensure_future(self._dispatch_batch(queue))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch_batch(self, queue):
+        try:
+            results = await self.api.batch_map([job for _, job, _ in queue])
+        except Exception as e:
+            for key, _, future in queue:
+                self._forget(key, future)
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (key, _, future), result in zip(queue, results):
+                if future.cancelled():
+                    self._forget(key, future)
+                elif not future.done():
+                    future.set_result(result)
@@ -2,6 +2,9 @@ __all__ = [
     "RateLimitError",
     "PayloadTooLargeError",
     "AuthenticationError",
+    "HTTPStatusError",
+    "APIConnectionError",
+    "MappingError",
 ]
 
 
@@ -15,3 +18,15 @@ class PayloadTooLargeError(AssertionError):
 
 class AuthenticationError(AssertionError):
     pass
+
+
+class HTTPStatusError(AssertionError):
+    pass
+
+
+class APIConnectionError(AssertionError):
+    pass
+
+
+class MappingError(AssertionError):
+    pass
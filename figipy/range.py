@@ -10,6 +10,7 @@ __all__ = [
 ]
 
 DATE_FORMAT = "%Y-%m-%d"
+YEAR_OFFSET = datetime.timedelta(weeks=52)
 
 NumberRange = Tuple[Optional[float], Optional[float]]
 DateRange = Tuple[Optional[datetime.date], Optional[datetime.date]]
@@ -19,9 +20,12 @@ def convert_date_range_to_string(date_range: Optional[DateRange]) -> List[str]:
     if date_range is None:
         return None
     first, second = date_range
-    year_offset = datetime.timedelta(weeks=52)
-    first, second = first or second - year_offset, second or first + year_offset
-    return [first.strftime(DATE_FORMAT), second.strftime(DATE_FORMAT)]
+    if first is None:
+        first = second - YEAR_OFFSET
+    elif second is None:
+        second = first + YEAR_OFFSET
+    # date.isoformat also drops the time part of datetime endpoints
+    return [datetime.date.isoformat(first), datetime.date.isoformat(second)]
 
 
 def convert_number_range_to_string(
@@ -30,7 +34,6 @@ def convert_number_range_to_string(
     if number_range is None:
         return None
     first, second = number_range
-    first, second = first or None, second or None
     return [first, second]
 
 
@@ -0,0 +1,35 @@
+import threading
+import time
+
+__all__ = [
+    "TokenBucket",
+]
+
+
+class TokenBucket:
+    """
+    Allows ``capacity`` acquisitions per ``refill_interval`` seconds. Tokens
+    refill continuously; ``acquire`` blocks until one is available.
+    """
+
+    def __init__(self, capacity: int, refill_interval: float):
+        self.capacity = capacity
+        self.refill_interval = refill_interval
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens
+                + (now - self._updated_at) * self.capacity / self.refill_interval,
+            )
+            self._updated_at = now
+            if self._tokens < 1:
+                time.sleep((1 - self._tokens) * self.refill_interval / self.capacity)
+                self._tokens = 1
+                self._updated_at = time.monotonic()
+            self._tokens -= 1
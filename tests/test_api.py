@@ -0,0 +1,400 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import certifi
+import pytest
+import urllib3
+
+from figipy import (
+    APIConnectionError,
+    AsyncOpenFIGIApi,
+    AuthenticationError,
+    HTTPStatusError,
+    MapLoader,
+    MappingError,
+    MappingValues,
+    OpenFIGIApi,
+    OpenFIGIProperties,
+    PayloadTooLargeError,
+    RateLimitError,
+)
+
+
+class FakeResponse:
+    def __init__(self, status=200, data=None, headers=None):
+        self.status = status
+        self.data = json.dumps(data if data is not None else {}).encode()
+        self.headers = headers or {}
+
+
+class FakePool:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, url, body=None, headers=None):
+        self.requests.append((method, url, body, headers))
+        return self.responses.pop(0)
+
+
+class SearchPool(FakePool):
+    """Answers every search with two pages of records named after the query."""
+
+    def request(self, method, url, body=None, headers=None):
+        self.requests.append((method, url, body, headers))
+        data = json.loads(body)
+        if "start" in data:
+            return FakeResponse(data={"data": [{"ticker": data["query"] + "-2"}]})
+        records = [{"ticker": data["query"] + "-1"}]
+        return FakeResponse(data={"data": records, "next": "page-2"})
+
+
+def create_api(*responses, **kwargs):
+    api = OpenFIGIApi(api_url="https://figi.test", **kwargs)
+    api._pool = FakePool(*responses)
+    return api
+
+
+def test_api_settings_fall_back_to_environment(monkeypatch):
+    monkeypatch.setenv("OPEN_FIGI_API_KEY", "secret")
+    monkeypatch.setenv("OPEN_FIGI_RAISE_ON_ERROR", "true")
+    monkeypatch.setenv("OPEN_FIGI_API_RETRY_COUNT", "5")
+    api = OpenFIGIApi()
+    assert api.api_key == "secret"
+    assert api.raise_on_error is True
+    assert api.api_retry_count == 5
+
+
+def test_explicit_api_settings_override_environment(monkeypatch):
+    monkeypatch.setenv("OPEN_FIGI_RAISE_ON_ERROR", "true")
+    monkeypatch.setenv("OPEN_FIGI_API_RETRY_COUNT", "5")
+    api = OpenFIGIApi(raise_on_error=False, api_retry_count=0)
+    assert api.raise_on_error is False
+    assert api.api_retry_count == 0
+
+
+def test_connection_pool_is_sized_by_pool_size():
+    assert OpenFIGIApi(pool_size=16).pool.connection_pool_kw["maxsize"] == 16
+
+
+def test_cached_responses_are_not_shared_between_callers():
+    api = create_api(FakeResponse(data={"values": ["NYSE"]}))
+    values = api.mapping_values(MappingValues.EXCHANGE_CODE)
+    values.append("MUTATED")
+    assert api.mapping_values(MappingValues.EXCHANGE_CODE) == ["NYSE"]
+    assert len(api.pool.requests) == 1
+
+
+def test_invalidated_cache_hits_the_network_again():
+    api = create_api(
+        FakeResponse(data={"values": ["NYSE"]}), FakeResponse(data={"values": ["US"]})
+    )
+    async_api = AsyncOpenFIGIApi(api)
+    assert api.mapping_values(MappingValues.EXCHANGE_CODE) == ["NYSE"]
+    async_api.invalidate_cache()
+    assert asyncio.run(async_api.mapping_values(MappingValues.EXCHANGE_CODE)) == ["US"]
+
+
+def test_async_api_runs_on_an_executor_sized_to_the_pool():
+    async_api = AsyncOpenFIGIApi(OpenFIGIApi(pool_size=3))
+    assert async_api.executor._max_workers == 3
+    async_api.close()
+    with pytest.raises(RuntimeError):
+        async_api.executor.submit(print)
+
+
+def test_async_api_leaves_supplied_executor_running():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        AsyncOpenFIGIApi(OpenFIGIApi(), executor=executor).close()
+        assert executor.submit(lambda: "running").result() == "running"
+
+
+def test_batch_map_returns_objects_per_job():
+    api = create_api(
+        FakeResponse(data=[{"data": [{"figi": "BBG000BLNNH6"}]}, {"warning": "None"}])
+    )
+    results = api.batch_map(
+        [{"idType": "TICKER", "idValue": "IBM"}, {"idType": "TICKER", "idValue": "?"}]
+    )
+    assert [[o.figi for o in result] for result in results] == [["BBG000BLNNH6"], []]
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        FakeResponse(status=429),
+        FakeResponse(status=500),
+        FakeResponse(data={"error": "Invalid idType"}),
+    ],
+)
+def test_failed_batch_map_raises(response):
+    api = create_api(response, response, response, api_retry_count=0)
+    with pytest.raises(MappingError):
+        api.batch_map([{"idType": "TICKER", "idValue": "IBM"}])
+
+
+def test_search_many_keeps_results_in_query_order():
+    api = OpenFIGIApi(api_url="https://figi.test", api_key="secret")
+    api._pool = SearchPool()
+    results = api.search_many(
+        [
+            ("IBM", None),
+            ("IBM", OpenFIGIProperties(currency="USD")),
+            ("AAPL", None),
+        ],
+        max_workers=3,
+    )
+    assert [[o.ticker for o in result] for result in results] == [
+        ["IBM-1", "IBM-2"],
+        ["IBM-1", "IBM-2"],
+        ["AAPL-1", "AAPL-2"],
+    ]
+    bodies = [json.loads(body) for _, _, body, _ in api.pool.requests]
+    assert {"query": "IBM", "currency": "USD", "start": "page-2"} in bodies
+
+
+def test_map_loader_coalesces_and_deduplicates_jobs():
+    api = create_api(
+        FakeResponse(data=[{"data": [{"figi": "BBG1"}]}, {"data": [{"figi": "BBG2"}]}])
+    )
+    loader = MapLoader(AsyncOpenFIGIApi(api))
+
+    async def load_all():
+        results = await asyncio.gather(
+            loader.load({"idType": "TICKER", "idValue": "IBM"}),
+            loader.load({"idType": "TICKER", "idValue": "AAPL"}),
+            loader.load({"idValue": "IBM", "idType": "TICKER"}),
+        )
+        cached = await loader.load({"idType": "TICKER", "idValue": "AAPL"})
+        return results, cached
+
+    results, cached = asyncio.run(load_all())
+    assert [[o.figi for o in result] for result in results] == [
+        ["BBG1"],
+        ["BBG2"],
+        ["BBG1"],
+    ]
+    assert [o.figi for o in cached] == ["BBG2"]
+    [(_, _, body, _)] = api.pool.requests
+    assert json.loads(body) == [
+        {"idType": "TICKER", "idValue": "IBM"},
+        {"idType": "TICKER", "idValue": "AAPL"},
+    ]
+
+
+def test_cancelled_caller_does_not_break_its_batch():
+    api = create_api(
+        FakeResponse(data=[{"data": [{"figi": "BBG1"}]}, {"data": [{"figi": "BBG2"}]}])
+    )
+    loader = MapLoader(AsyncOpenFIGIApi(api))
+    ibm = {"idType": "TICKER", "idValue": "IBM"}
+    aapl = {"idType": "TICKER", "idValue": "AAPL"}
+
+    async def load_with_timeout():
+        impatient = asyncio.ensure_future(loader.load(ibm))
+        patient = asyncio.ensure_future(loader.load(aapl))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient, await loader.load(ibm)
+
+    aapl_result, ibm_result = asyncio.run(load_with_timeout())
+    assert [o.figi for o in aapl_result] == ["BBG2"]
+    assert [o.figi for o in ibm_result] == ["BBG1"]
+    assert len(api.pool.requests) == 1
+
+
+def test_map_loader_forgets_failed_batches():
+    api = create_api(
+        FakeResponse(status=500), FakeResponse(data=[{"data": [{"figi": "BBG1"}]}])
+    )
+    loader = MapLoader(AsyncOpenFIGIApi(api))
+    job = {"idType": "TICKER", "idValue": "IBM"}
+
+    async def load_twice():
+        with pytest.raises(MappingError):
+            await loader.load(job)
+        return await loader.load(job)
+
+    assert [o.figi for o in asyncio.run(load_twice())] == ["BBG1"]
+
+
+@pytest.fixture()
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    return sleeps
+
+
+@pytest.mark.parametrize(
+    ("headers", "expected_sleep"),
+    [
+        ({"Retry-After": "3"}, 3),
+        ({"Retry-After": "86400"}, 60),
+        ({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}, 6),
+        ({}, 6),
+    ],
+)
+def test_rate_limited_requests_are_retried(sleeps, headers, expected_sleep):
+    api = create_api(
+        FakeResponse(status=429, headers=headers),
+        FakeResponse(data={"values": ["NYSE"]}),
+        api_key="secret",
+    )
+    assert api.mapping_values(MappingValues.EXCHANGE_CODE) == ["NYSE"]
+    assert sleeps == [expected_sleep]
+    assert len(api.pool.requests) == 2
+
+
+def test_rate_limited_requests_give_up_after_retry_count(sleeps):
+    api = create_api(*[FakeResponse(status=429)] * 3, api_retry_count=2)
+    assert list(api.search_raw("IBM")) == []
+    assert len(api.pool.requests) == 3
+    assert len(sleeps) == 2
+
+
+class RecordingBucket:
+    refill_interval = 60
+
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+def test_search_and_mapping_draw_from_separate_buckets():
+    api = create_api(
+        FakeResponse(data={"data": [{"figi": "BBG1"}]}),
+        FakeResponse(data=[{"data": [{"figi": "BBG1"}]}]),
+        FakeResponse(data={"values": ["NYSE"]}),
+    )
+    api._search_bucket = RecordingBucket()
+    api._mapping_bucket = RecordingBucket()
+    list(api.search_raw("IBM"))
+    api.batch_map([{"idType": "TICKER", "idValue": "IBM"}])
+    api.mapping_values(MappingValues.EXCHANGE_CODE)
+    assert api._search_bucket.acquired == 1
+    assert api._mapping_bucket.acquired == 2
+
+
+@pytest.mark.parametrize(
+    ("api_key", "search_limit", "mapping_limit"),
+    [("", (5, 60), (25, 60)), ("secret", (20, 60), (25, 6))],
+)
+def test_buckets_follow_endpoint_rate_limits(api_key, search_limit, mapping_limit):
+    api = OpenFIGIApi(api_key=api_key)
+    search, mapping = api._search_bucket, api._mapping_bucket
+    assert (search.capacity, search.refill_interval) == search_limit
+    assert (mapping.capacity, mapping.refill_interval) == mapping_limit
+
+
+def test_requests_send_prebuilt_headers():
+    api = create_api(FakeResponse(data={"values": []}), api_key="secret")
+    api.mapping_values(MappingValues.CURRENCY)
+    _, _, _, headers = api.pool.requests[0]
+    assert headers["Content-Type"] == "application/json"
+    assert headers["X-OPENFIGI-APIKEY"] == "secret"
+    assert "gzip" in headers["accept-encoding"]
+
+
+def test_get_requests_have_no_body():
+    api = create_api(FakeResponse(data={"values": ["USD"]}))
+    assert api.mapping_values(MappingValues.CURRENCY) == ["USD"]
+    assert api.pool.requests[0][:3] == (
+        "GET",
+        "https://figi.test/v2/mapping/values/currency",
+        None,
+    )
+
+
+def test_post_requests_send_json_body():
+    api = create_api(FakeResponse(data={"data": []}))
+    assert list(api.search_raw("IBM")) == []
+    method, _, body, _ = api.pool.requests[0]
+    assert method == "POST"
+    assert json.loads(body) == {"query": "IBM"}
+
+
+def test_failed_requests_return_empty_response():
+    api = create_api(FakeResponse(status=500))
+    assert list(api.search_raw("IBM")) == []
+
+
+def test_failed_requests_raise_when_requested():
+    api = create_api(FakeResponse(status=500), raise_on_error=True)
+    with pytest.raises(HTTPStatusError):
+        list(api.search_raw("IBM"))
+
+
+@pytest.mark.parametrize(
+    ("status", "error_class", "log_level"),
+    [
+        (429, RateLimitError, logging.WARNING),
+        (413, PayloadTooLargeError, logging.WARNING),
+        (403, AuthenticationError, logging.ERROR),
+    ],
+)
+def test_status_codes_are_logged_and_raised(caplog, status, error_class, log_level):
+    api = create_api(
+        FakeResponse(status=status), raise_on_error=True, api_retry_count=0
+    )
+    with pytest.raises(error_class):
+        list(api.search_raw("IBM"))
+    assert [record.levelno for record in caplog.records] == [log_level]
+
+
+def test_connection_failures_raise_api_connection_error():
+    class UnreachablePool:
+        def request(self, method, url, body=None, headers=None):
+            raise urllib3.exceptions.MaxRetryError(None, url)
+
+    api = create_api()
+    api._pool = UnreachablePool()
+    with pytest.raises(APIConnectionError):
+        api.mapping_values(MappingValues.CURRENCY)
+
+
+@pytest.fixture()
+def environment(monkeypatch):
+    for variable in (
+        "REQUESTS_CA_BUNDLE",
+        "CURL_CA_BUNDLE",
+        "SSL_CERT_FILE",
+        "ALL_PROXY",
+        "HTTPS_PROXY",
+        "NO_PROXY",
+    ):
+        monkeypatch.delenv(variable, raising=False)
+        monkeypatch.delenv(variable.lower(), raising=False)
+    return monkeypatch
+
+
+def test_pool_verifies_against_certifi_by_default(environment):
+    pool = OpenFIGIApi().pool
+    assert pool.connection_pool_kw["ca_certs"] == certifi.where()
+    assert not isinstance(pool, urllib3.ProxyManager)
+
+
+def test_pool_honours_ca_bundle_variables(environment):
+    environment.setenv("REQUESTS_CA_BUNDLE", "/etc/corporate-ca.pem")
+    pool = OpenFIGIApi().pool
+    assert pool.connection_pool_kw["ca_certs"] == "/etc/corporate-ca.pem"
+
+
+def test_pool_uses_configured_proxy(environment):
+    environment.setenv("HTTPS_PROXY", "http://proxy.test:3128")
+    pool = OpenFIGIApi().pool
+    assert isinstance(pool, urllib3.ProxyManager)
+    assert pool.proxy.host == "proxy.test"
+
+
+def test_pool_skips_proxy_for_excluded_hosts(environment):
+    environment.setenv("HTTPS_PROXY", "http://proxy.test:3128")
+    environment.setenv("NO_PROXY", "api.openfigi.com")
+    pool = OpenFIGIApi(api_url="https://api.openfigi.com").pool
+    assert not isinstance(pool, urllib3.ProxyManager)
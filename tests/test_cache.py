@@ -0,0 +1,25 @@
+from figipy import TTLCache
+
+
+def test_cache_returns_stored_value():
+    cache = TTLCache()
+    cache["key"] = {"values": ["NYSE"]}
+    assert cache.get("key") == {"values": ["NYSE"]}
+    assert cache.get("missing") is None
+
+
+def test_cache_expires_entries():
+    cache = TTLCache(ttl=0)
+    cache["key"] = "value"
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_oldest_entry():
+    cache = TTLCache(maxsize=2)
+    cache["first"] = 1
+    cache["second"] = 2
+    cache["third"] = 3
+    assert cache.get("first") is None
+    assert cache.get("second") == 2
+    assert cache.get("third") == 3
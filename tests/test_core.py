@@ -1,7 +1,8 @@
 import datetime
+import pickle
 import pytest
 
-from figipy import OpenFIGIProperties
+from figipy import OpenFIGIObject, OpenFIGIProperties
 
 
 @pytest.mark.parametrize(
@@ -45,3 +46,30 @@ from figipy import OpenFIGIProperties
 )
 def test_properties_propagated_when_calling_filter(property_object, expected_filter):
     assert property_object.as_filter() == expected_filter
+
+
+def test_figi_objects_survive_pickling():
+    figi_object = OpenFIGIObject(figi="BBG000BLNNH6", ticker="IBM")
+    assert pickle.loads(pickle.dumps(figi_object)) == figi_object
+
+
+def test_figi_objects_compare_by_value_but_are_unhashable():
+    assert OpenFIGIObject(figi="BBG1") == OpenFIGIObject(figi="BBG1")
+    assert OpenFIGIObject(figi="BBG1") != OpenFIGIObject(figi="BBG2")
+    with pytest.raises(TypeError):
+        hash(OpenFIGIObject(figi="BBG1"))
+
+
+def test_figi_data_fields_are_mapped():
+    figi_object = OpenFIGIObject.from_figi_data(
+        {
+            "figi": "BBG000BLNNH6",
+            "ticker": "IBM",
+            "exchCode": "US",
+            "securityType2": "Common Stock",
+        }
+    )
+    assert figi_object.figi == "BBG000BLNNH6"
+    assert figi_object.ticker == "IBM"
+    assert figi_object.exchange_code == "US"
+    assert figi_object.security_type_2 == "Common Stock"
@@ -1,7 +1,11 @@
 import pytest
 import datetime
 
-from figipy import assert_data_range_is_valid, convert_date_range_to_string
+from figipy import (
+    assert_data_range_is_valid,
+    convert_date_range_to_string,
+    convert_number_range_to_string,
+)
 
 
 @pytest.mark.parametrize(
@@ -34,8 +38,25 @@ def test_data_range_assertion(data_range, expected_to_succeed):
             (datetime.date(2020, 11, 12), datetime.date(2020, 11, 12)),
             ["2020-11-12", "2020-11-12"],
         ),
+        (
+            (datetime.datetime(2020, 11, 12, 15, 30), None),
+            ["2020-11-12", "2021-11-11"],
+        ),
         (None, None),
     ],
 )
 def test_date_range_to_string(date_range, expected_date_range_string):
     assert convert_date_range_to_string(date_range) == expected_date_range_string
+
+
+@pytest.mark.parametrize(
+    ("number_range", "expected_number_range"),
+    [
+        ((2, 3), [2, 3]),
+        ((0, 5), [0, 5]),
+        ((0.5, None), [0.5, None]),
+        (None, None),
+    ],
+)
+def test_number_range_to_string(number_range, expected_number_range):
+    assert convert_number_range_to_string(number_range) == expected_number_range
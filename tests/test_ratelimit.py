@@ -0,0 +1,20 @@
+import time
+
+from figipy import TokenBucket
+
+
+def test_bucket_allows_bursts_up_to_capacity():
+    bucket = TokenBucket(capacity=3, refill_interval=60)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 1
+
+
+def test_bucket_waits_for_refill_when_empty():
+    bucket = TokenBucket(capacity=2, refill_interval=0.2)
+    bucket.acquire()
+    bucket.acquire()
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.09